@@ -0,0 +1,44 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import wave
+
+import mixer
+import song
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export songs to WAV files')
+    parser.add_argument('songs', nargs='+')
+    parser.add_argument(
+        '--out_dir', help='where to write the WAV files, next to the songs by '
+        'default')
+    args = parser.parse_args()
+
+    self_dir = os.path.dirname(os.path.realpath(__file__))
+    samples, sample_rate = mixer.load_samples(self_dir + '/samples/katy')
+    for song_path in args.songs:
+        music, tempo_idx, tracks = song.load_song(song_path)
+        song_mixer = mixer.SongMixer(
+            samples,
+            sample_rate,
+            music,
+            song.TEMPOS_BPMS[tempo_idx],
+            tracks=tracks,
+            loop=False)
+        wav_path = os.path.splitext(song_path)[0] + '.wav'
+        if args.out_dir:
+            wav_path = os.path.join(args.out_dir, os.path.basename(wav_path))
+        with wave.open(wav_path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            for index in range(song_mixer.num_segments()):
+                f.writeframes(song_mixer.pcm(index * mixer.SEGMENT_STEPS))
+        print(wav_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+import curses
+
+
+class GridView:
+    ''' Shows the part of the music grid around the cursor.
+
+    The whole grid lives in a pad where only changed cells are rewritten, and
+    only the visible window of the pad is copied to the screen.
+    '''
+
+    def __init__(self, stdscr, music: list) -> None:
+        self._stdscr = stdscr
+        self._music = music
+        self._num_rows = len(music)
+        self._num_cols = len(music[0])
+        # one more column so that writing the last cell does not fail
+        self._pad = curses.newpad(self._num_rows, self._num_cols + 1)
+        for i, row in enumerate(music):
+            self._pad.addstr(i, 0, ''.join(row))
+        self._highlighted = set()
+        self._top = 0
+        self._left = 0
+        self.layout()
+
+    def layout(self) -> None:
+        ''' Fits the view and its border to the screen'''
+        scr_height, scr_width = self._stdscr.getmaxyx()
+        # the border and the status line below it
+        self._view_rows = max(1, min(self._num_rows, scr_height - 3))
+        self._view_cols = max(1, min(self._num_cols, scr_width - 2))
+        self._i0 = max(1, (scr_height - self._view_rows - 1) // 2)
+        self._j0 = max(1, (scr_width - self._view_cols) // 2)
+        self._stdscr.erase()
+        border = self._stdscr.derwin(self._view_rows + 2, self._view_cols + 2,
+                                     self._i0 - 1, self._j0 - 1)
+        border.box()
+
+    def update_cell(self, i: int, j: int) -> None:
+        attr = curses.A_REVERSE if (i, j) in self._highlighted else 0
+        self._pad.addch(i, j, self._music[i][j], attr)
+
+    def highlight(self, cells: list) -> None:
+        old_cells = self._highlighted
+        self._highlighted = set(cells)
+        for i, j in old_cells | self._highlighted:
+            self.update_cell(i, j)
+
+    def set_status(self, status: str) -> None:
+        row = self._i0 + self._view_rows + 1
+        self._stdscr.move(row, self._j0)
+        self._stdscr.clrtoeol()
+        self._stdscr.addnstr(row, self._j0, status,
+                             self._stdscr.getmaxyx()[1] - self._j0 - 1)
+
+    def show(self, cursor_i: int, cursor_j: int) -> None:
+        ''' Scrolls to the cursor and updates the screen'''
+        self._top = min(max(self._top, cursor_i - self._view_rows + 1),
+                        cursor_i)
+        self._left = min(max(self._left, cursor_j - self._view_cols + 1),
+                         cursor_j)
+        cursor_y = self._i0 + cursor_i - self._top
+        cursor_x = self._j0 + cursor_j - self._left
+        # getch() refreshes stdscr, which puts the cursor where stdscr has it
+        self._stdscr.move(cursor_y, cursor_x)
+        self._stdscr.noutrefresh()
+        self._pad.move(cursor_i, cursor_j)
+        self._pad.noutrefresh(self._top, self._left, self._i0, self._j0,
+                              self._i0 + self._view_rows - 1,
+                              self._j0 + self._view_cols - 1)
+        curses.doupdate()
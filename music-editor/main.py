@@ -5,10 +5,21 @@ import argparse
 import curses
 import simpleaudio
 import os
-import time
+import selectors
+import signal
+import socket
+import sys
+
+import mixer
+import song
+from grid_view import GridView
+from sequencer import Sequencer
 
 
 def normalize(args, i, j):
+    if args.tracks:
+        # the cursor stays on its track
+        return i % args.num_rows, j % args.num_cols
     if j == -1:
         j = args.num_cols - 1
         i -= 1
@@ -24,121 +35,174 @@ def normalize(args, i, j):
 
 def main(stdscr):
     parser = argparse.ArgumentParser(description='Music Toy Editor')
-    parser.add_argument('num_rows', type=int)
-    parser.add_argument('num_cols', type=int)
+    parser.add_argument('num_rows', type=int, nargs='?')
+    parser.add_argument('num_cols', type=int, nargs='?')
+    parser.add_argument(
+        '--song',
+        help='song file to edit, saved on F2 and ESC; the size comes from the '
+        'file if it exists')
+    parser.add_argument(
+        '--tracks',
+        action='store_true',
+        help='every row is a track and all the rows play together')
     args = parser.parse_args()
+    tempo_idx = 4
+    if args.song and os.path.exists(args.song):
+        music, tempo_idx, args.tracks = song.load_song(args.song)
+        args.num_rows = len(music)
+        args.num_cols = len(music[0])
+    elif args.num_rows and args.num_cols:
+        music = [list('-' * args.num_cols) for i in range(args.num_rows)]
+    else:
+        parser.error('num_rows and num_cols are required for a new song')
 
     self_dir = os.path.dirname(os.path.realpath(__file__))
-    key_to_wave = {}
-    for key, filename in [('-', 'silence.wav'), ('D', 'note060-do.wav'),
-                          ('R', 'note062-re.wav'), ('M', 'note064-mi.wav'),
-                          ('F', 'note065-fa.wav'), ('S', 'note067-so.wav'),
-                          ('L', 'note069-la.wav'), ('T', 'note071-ti.wav'),
-                          ('d', 'note072-do.wav')]:
-        key_to_wave[key] = simpleaudio.WaveObject.from_wave_file(
-            self_dir + '/samples/katy/' + filename)
-
-    scr_height, scr_width = stdscr.getmaxyx()
-    music = [list('-' * args.num_cols) for i in range(args.num_rows)]
+    samples, sample_rate = mixer.load_samples(self_dir + '/samples/katy')
+
     cursor_i = 0
     cursor_j = 0
-    tempos_bpms = [30, 36, 45, 60, 72, 90, 120, 144, 180]
-    tempo_idx = 4
+    tempos_bpms = song.TEMPOS_BPMS
     is_playing = False
     player = None
-    assert scr_height >= args.num_rows + 2
-    assert scr_width >= args.num_cols + 2
-    i0 = (scr_height - args.num_rows) // 2
-    j0 = (scr_width - args.num_cols) // 2
-    border = stdscr.derwin(args.num_rows + 2, args.num_cols + 2, i0 - 1,
-                           j0 - 1)
-    win = border.derwin(1, 1)
+    player_segment = None
+    song_mixer = mixer.SongMixer(
+        samples,
+        sample_rate,
+        music,
+        tempos_bpms[tempo_idx],
+        tracks=args.tracks)
+    view = GridView(stdscr, music)
+
+    def set_cell(i, j, key):
+        song_mixer.set_cell(i, j, key)
+        view.update_cell(i, j)
 
     curses.init_pair(2, curses.COLOR_YELLOW, curses.COLOR_BLUE)
     curses.init_pair(3, curses.COLOR_WHITE, curses.COLOR_BLACK)
 
+    sequencer = Sequencer()
+    selector = selectors.DefaultSelector()
+    selector.register(sys.stdin, selectors.EVENT_READ)
+    # select() is retried after a signal, so a resize has to wake it up
+    # through the wakeup fd, which needs a Python handler instead of the one of
+    # curses
+    resize_r, resize_w = socket.socketpair()
+    resize_r.setblocking(False)
+    resize_w.setblocking(False)
+    signal.set_wakeup_fd(resize_w.fileno())
+    signal.signal(signal.SIGWINCH, lambda signum, frame: None)
+    selector.register(resize_r, selectors.EVENT_READ)
+    stdscr.nodelay(True)
+    is_dirty = True
+
     while True:
-        stdscr.clear()
-        border.box()
-        stdscr.addstr(i0 + args.num_rows + 1, j0, 'TEMPO:{}'.format(
-            tempos_bpms[tempo_idx]))
-        for i in range(args.num_rows):
-            win.addstr(i, 0, ''.join(music[i]))
-        if is_playing:
-            win.addch(cursor_i, cursor_j, music[cursor_i][cursor_j],
-                      curses.A_REVERSE)
-        curses.curs_set(not is_playing)
-        stdscr.move(i0 + cursor_i, j0 + cursor_j)
-        stdscr.refresh()
+        if is_dirty:
+            status = 'TEMPO:{}'.format(tempos_bpms[tempo_idx])
+            if sequencer.late_steps:
+                status += ' LATE:{}'.format(sequencer.late_steps)
+            view.set_status(status)
+            if is_playing and args.tracks:
+                view.highlight([(i, cursor_j) for i in range(args.num_rows)])
+            elif is_playing:
+                view.highlight([(cursor_i, cursor_j)])
+            else:
+                view.highlight([])
+            curses.curs_set(not is_playing)
+            view.show(cursor_i, cursor_j)
+            is_dirty = False
 
-        stdscr.nodelay(is_playing)
+        # wait for a key or the next step, whichever comes first
+        timeout = None
         if is_playing:
-            if music[cursor_i][cursor_j] != '-':
-                if player:
-                    player.stop()
-                player = key_to_wave[music[cursor_i][cursor_j]].play()
-            time.sleep(60.0 / tempos_bpms[tempo_idx])
+            timeout = max(0, sequencer.time_until_next_step())
+        for key, _ in selector.select(timeout):
+            if key.fileobj is resize_r:
+                resize_r.recv(4096)
+                # queues a KEY_RESIZE for getch()
+                size = os.get_terminal_size(sys.stdin.fileno())
+                curses.resizeterm(size.lines, size.columns)
+
+        while True:
             c = stdscr.getch()
+            if c == -1:
+                break
+            # an ignored key must not drop the redraw of an earlier one
+            key_is_dirty = True
             if c == 27:  # ESC
-                is_playing = False
                 if player:
                     player.stop()
-                player = None
+                if args.song:
+                    song.save_song(args.song, music, tempo_idx, args.tracks)
                 return
-            if c == ord(' '):
+            if c == curses.KEY_RESIZE:
+                view.layout()
+            elif c == ord(' ') and is_playing:
                 is_playing = False
                 if player:
                     player.stop()
                 player = None
-                continue
-            cursor_j += 1
-            cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-        else:
-            while True:
-                c = stdscr.getch()
-                if c == 27:  # ESC
-                    return
-                if c == curses.KEY_HOME:
-                    cursor_j = 0
-                    break
-                if c == curses.KEY_END:
-                    cursor_j = args.num_cols - 1
-                    break
-                if c == curses.KEY_LEFT:
-                    cursor_j -= 1
-                    cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    break
-                if c == curses.KEY_BACKSPACE:
-                    cursor_j -= 1
-                    cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    music[cursor_i][cursor_j] = '-'
-                    break
-                if c == curses.KEY_RIGHT:
-                    cursor_j += 1
-                    cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    break
-                if c == curses.KEY_UP:
-                    cursor_i -= 1
-                    cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    break
-                if c == curses.KEY_DOWN:
-                    cursor_i += 1
-                    cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    break
-                if c > 0 and c < 128 and chr(c) in key_to_wave:
-                    music[cursor_i][cursor_j] = chr(c)
+                player_segment = None
+            elif is_playing:
+                key_is_dirty = False
+            elif c == curses.KEY_F2:
+                if args.song:
+                    song.save_song(args.song, music, tempo_idx, args.tracks)
+            elif c == curses.KEY_HOME:
+                cursor_j = 0
+            elif c == curses.KEY_END:
+                cursor_j = args.num_cols - 1
+            elif c == curses.KEY_LEFT:
+                cursor_j -= 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+            elif c == curses.KEY_BACKSPACE:
+                cursor_j -= 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+                set_cell(cursor_i, cursor_j, mixer.SILENCE)
+            elif c == curses.KEY_RIGHT:
+                cursor_j += 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+            elif c == curses.KEY_UP:
+                cursor_i -= 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+            elif c == curses.KEY_DOWN:
+                cursor_i += 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+            elif c > 0 and c < 128 and chr(c) in samples:
+                set_cell(cursor_i, cursor_j, chr(c))
+                cursor_j += 1
+                cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
+            elif c == ord(' '):
+                is_playing = True
+                sequencer.start(tempos_bpms[tempo_idx])
+            elif c == ord('['):
+                tempo_idx = max(0, tempo_idx - 1)
+                song_mixer.set_tempo(tempos_bpms[tempo_idx])
+            elif c == ord(']'):
+                tempo_idx = min(len(tempos_bpms) - 1, tempo_idx + 1)
+                song_mixer.set_tempo(tempos_bpms[tempo_idx])
+            else:
+                key_is_dirty = False
+            is_dirty = is_dirty or key_is_dirty
+
+        if is_playing and sequencer.time_until_next_step() <= 0:
+            # the first step plays the cell under the cursor
+            if player:
+                for _ in range(sequencer.advance()):
                     cursor_j += 1
                     cursor_i, cursor_j = normalize(args, cursor_i, cursor_j)
-                    break
-                if c == ord(' '):
-                    is_playing = True
-                    break
-                if c == ord('['):
-                    tempo_idx = max(0, tempo_idx - 1)
-                    break
-                if c == ord(']'):
-                    tempo_idx = min(len(tempos_bpms) - 1, tempo_idx + 1)
-                    break
+            else:
+                sequencer.advance()
+            # a mixed segment plays on its own, start the next one when the
+            # cursor reaches it or the song loops
+            step = song_mixer.step(cursor_i, cursor_j)
+            if (step % mixer.SEGMENT_STEPS == 0 or
+                    step // mixer.SEGMENT_STEPS != player_segment):
+                if player:
+                    player.stop()
+                player = simpleaudio.play_buffer(
+                    song_mixer.pcm(step), 1, 2, sample_rate)
+                player_segment = step // mixer.SEGMENT_STEPS
+            is_dirty = True
 
 
 if __name__ == '__main__':
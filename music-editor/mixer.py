@@ -0,0 +1,148 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+import collections
+import wave
+
+import numpy
+
+SILENCE = '-'
+SAMPLE_FILES = [(SILENCE, 'silence.wav'), ('D', 'note060-do.wav'),
+                ('R', 'note062-re.wav'), ('M', 'note064-mi.wav'),
+                ('F', 'note065-fa.wav'), ('S', 'note067-so.wav'),
+                ('L', 'note069-la.wav'), ('T', 'note071-ti.wav'),
+                ('d', 'note072-do.wav')]
+# the number of steps mixed together, and the number of mixed segments kept
+SEGMENT_STEPS = 32
+MAX_SEGMENTS = 8
+
+
+def load_samples(samples_dir: str) -> (dict, int):
+    ''' Returns the mono 16 bit PCM of every key and the sample rate'''
+    samples = {}
+    sample_rate = None
+    for key, filename in SAMPLE_FILES:
+        with wave.open(samples_dir + '/' + filename, 'rb') as f:
+            assert f.getnchannels() == 1
+            assert f.getsampwidth() == 2
+            assert sample_rate in (None, f.getframerate())
+            sample_rate = f.getframerate()
+            samples[key] = numpy.frombuffer(
+                f.readframes(f.getnframes()), dtype='<i2')
+    return samples, sample_rate
+
+
+class SongMixer:
+    ''' Mixes the music grid into PCM, one segment of steps at a time.
+
+    A segment is mixed when it is first played and kept until a cell that can
+    be heard in it changes, so the cost does not grow with the song. A sample
+    longer than a step spills over the following steps, wrapping around to the
+    start of the song. Without loop, steps are added for the tails of the last
+    notes instead.
+
+    With tracks, every row of the grid is a track and the step of a cell is its
+    column, otherwise the grid is played row by row.
+    '''
+
+    def __init__(self,
+                 samples: dict,
+                 sample_rate: int,
+                 music: list,
+                 bpm: float,
+                 tracks: bool = False,
+                 loop: bool = True) -> None:
+        self._samples = samples
+        self._sample_rate = sample_rate
+        self._music = music
+        self._tracks = tracks
+        self._loop = loop
+        self._num_cols = len(music[0])
+        if tracks:
+            self._num_steps = self._num_cols
+        else:
+            self._num_steps = len(music) * self._num_cols
+        self.set_tempo(bpm)
+
+    def step(self, i: int, j: int) -> int:
+        if self._tracks:
+            return j
+        return i * self._num_cols + j
+
+    def set_tempo(self, bpm: float) -> None:
+        ''' Drops every mixed segment'''
+        self._step_frames = int(round(self._sample_rate * 60.0 / bpm))
+        self._blocks = {}
+        for key, sample in self._samples.items():
+            padded = numpy.zeros(-(-len(sample) // self._step_frames) *
+                                 self._step_frames, dtype=numpy.int32)
+            padded[:len(sample)] = sample
+            self._blocks[key] = padded.reshape(-1, self._step_frames)
+        # the number of steps a sample spills over
+        self._tail_steps = max(
+            len(blocks) for blocks in self._blocks.values()) - 1
+        self._num_rows = self._num_steps
+        if not self._loop:
+            self._num_rows += self._tail_steps
+        self._segments = collections.OrderedDict()
+
+    def set_cell(self, i: int, j: int, key: str) -> None:
+        ''' Changes the grid and drops the segments the change is heard in'''
+        old_key = self._music[i][j]
+        self._music[i][j] = key
+        if key == old_key:
+            return
+        step = self.step(i, j)
+        for row in range(step, step + self._tail_steps + 1):
+            self._segments.pop(row % self._num_rows // SEGMENT_STEPS, None)
+
+    def num_segments(self) -> int:
+        return -(-self._num_rows // SEGMENT_STEPS)
+
+    def pcm(self, step: int) -> bytes:
+        ''' Returns the mono 16 bit PCM from the given step to the end of its
+        segment'''
+        index, row = divmod(step, SEGMENT_STEPS)
+        return self._segment(index)[row:].tobytes()
+
+    def _segment(self, index: int) -> numpy.ndarray:
+        if index in self._segments:
+            self._segments.move_to_end(index)
+            return self._segments[index]
+        segment = self._mix_segment(index)
+        self._segments[index] = segment
+        if len(self._segments) > MAX_SEGMENTS:
+            self._segments.popitem(last=False)
+        return segment
+
+    def _mix_segment(self, index: int) -> numpy.ndarray:
+        first_row = index * SEGMENT_STEPS
+        num_rows = min(SEGMENT_STEPS, self._num_rows - first_row)
+        mix = numpy.zeros((num_rows, self._step_frames), dtype=numpy.int32)
+        # the offsets from first_row of the notes heard in the segment
+        offsets_by_key = {}
+        begin = first_row - self._tail_steps
+        end = first_row + num_rows
+        if not self._loop:
+            begin = max(0, begin)
+            end = min(self._num_steps, end)
+        for position in range(begin, end):
+            for key in self._keys(position % self._num_steps):
+                if key != SILENCE:
+                    offsets_by_key.setdefault(key,
+                                              []).append(position - first_row)
+        for key, offsets in offsets_by_key.items():
+            # several tracks may play the same key at the same step
+            offsets, counts = numpy.unique(offsets, return_counts=True)
+            counts = counts[:, numpy.newaxis]
+            for b, block in enumerate(self._blocks[key]):
+                rows = offsets + b
+                heard = (rows >= 0) & (rows < num_rows)
+                mix[rows[heard]] += counts[heard] * block
+        return numpy.clip(mix, -32768, 32767).astype(numpy.int16)
+
+    def _keys(self, step: int) -> list:
+        if self._tracks:
+            return [row[step] for row in self._music]
+        i, j = divmod(step, self._num_cols)
+        return [self._music[i][j]]
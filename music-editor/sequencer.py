@@ -0,0 +1,107 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+import argparse
+import random
+import sys
+import time
+
+# a step later than this is reported as late
+LATE_TOLERANCE = 0.005
+
+
+class Sequencer:
+    ''' Schedules steps on absolute time.monotonic() deadlines, so the time
+    spent between steps does not add up to a drift'''
+
+    def __init__(self) -> None:
+        self._step_duration = 1.0
+        self._deadline = 0.0
+        self.late_steps = 0
+        self.skipped_steps = 0
+
+    def start(self, bpm: float) -> None:
+        ''' The first step is due immediately'''
+        self._step_duration = 60.0 / bpm
+        self._deadline = time.monotonic()
+        self.late_steps = 0
+        self.skipped_steps = 0
+
+    def deadline(self) -> float:
+        return self._deadline
+
+    def time_until_next_step(self) -> float:
+        return self._deadline - time.monotonic()
+
+    def wait(self) -> int:
+        ''' Sleeps until the next step is due.
+
+        Returns the number of steps to advance. It is more than 1 when a whole
+        step was missed; the missed steps are skipped to stay in tempo.
+        '''
+        remaining = self._deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.advance()
+
+    def advance(self) -> int:
+        ''' Same as wait() once the next step is due'''
+        lateness = time.monotonic() - self._deadline
+        assert lateness >= 0
+        steps = 1 + int(lateness / self._step_duration)
+        if lateness > LATE_TOLERANCE:
+            self.late_steps += 1
+        self.skipped_steps += steps - 1
+        self._deadline += steps * self._step_duration
+        return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure the step jitter of the sequencer under load')
+    parser.add_argument('--bpm', type=float, default=6000)
+    parser.add_argument('--steps', type=int, default=3000)
+    parser.add_argument(
+        '--load', type=float, default=0.5, help='max busy time per step')
+    parser.add_argument(
+        '--max_p99_ms',
+        type=float,
+        default=1000 * LATE_TOLERANCE,
+        help='fail if the 99th percentile of the jitter is higher')
+    parser.add_argument(
+        '--max_drift_ms',
+        type=float,
+        default=1000 * LATE_TOLERANCE,
+        help='fail if the last step is later than this')
+    args = parser.parse_args()
+
+    step_duration = 60.0 / args.bpm
+    sequencer = Sequencer()
+    sequencer.start(args.bpm)
+    start = sequencer.deadline()
+    step = 0
+    jitters = []
+    while step < args.steps:
+        step += sequencer.wait()
+        jitters.append(time.monotonic() - (start + (step - 1) * step_duration))
+        # pretend to render
+        time.sleep(random.uniform(0, args.load) * step_duration)
+    drift = jitters[-1]
+    jitters.sort()
+    print('steps: {} late: {} skipped: {}'.format(
+        len(jitters), sequencer.late_steps, sequencer.skipped_steps))
+    print('jitter ms: median {:.3f} p99 {:.3f} max {:.3f}'.format(
+        1000 * jitters[len(jitters) // 2],
+        1000 * jitters[len(jitters) * 99 // 100], 1000 * jitters[-1]))
+    print('drift ms: {:.3f}'.format(1000 * drift))
+    failures = []
+    if 1000 * jitters[len(jitters) * 99 // 100] > args.max_p99_ms:
+        failures.append('p99 jitter over {} ms'.format(args.max_p99_ms))
+    if 1000 * abs(drift) > args.max_drift_ms:
+        failures.append('drift over {} ms'.format(args.max_drift_ms))
+    if failures:
+        sys.exit('FAILED: ' + ', '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+
+TEMPOS_BPMS = [30, 36, 45, 60, 72, 90, 120, 144, 180]
+
+MAGIC = b'KKSONG'
+VERSION = 1
+# magic, version, flags, number of rows, number of columns, tempo index,
+# followed by one byte per cell, row by row
+HEADER = struct.Struct('<6sBBHHB')
+# every row is a track and all the rows play together
+FLAG_TRACKS = 0x01
+
+
+def save_song(path: str, music: list, tempo_idx: int, tracks: bool) -> None:
+    cells = ''.join(''.join(row) for row in music).encode('ascii')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(
+            HEADER.pack(MAGIC, VERSION, FLAG_TRACKS if tracks else 0,
+                        len(music), len(music[0]), tempo_idx))
+        f.write(cells)
+    # never leave a half written song behind
+    os.replace(tmp_path, path)
+
+
+def load_song(path: str) -> (list, int, bool):
+    ''' Returns the music grid, the tempo index and whether rows are tracks'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, flags, num_rows, num_cols, tempo_idx = HEADER.unpack_from(
+        data)
+    assert magic == MAGIC, path + ' is not a song'
+    assert version == VERSION
+    assert 0 <= tempo_idx < len(TEMPOS_BPMS)
+    cells = data[HEADER.size:].decode('ascii')
+    assert len(cells) == num_rows * num_cols
+    music = [
+        list(cells[i * num_cols:(i + 1) * num_cols]) for i in range(num_rows)
+    ]
+    return music, tempo_idx, bool(flags & FLAG_TRACKS)
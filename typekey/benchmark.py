@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import timeit
+
+import main as typekey
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the bitmap to block char converters')
+    parser.add_argument('--text', default='Jeremy')
+    parser.add_argument('--font_size', type=int, default=48)
+    parser.add_argument('--number', type=int, default=100)
+    args = parser.parse_args()
+
+    assert typekey.numpy, 'numpy is required to compare the converters'
+    font = typekey.load_font(args.font_size)
+    for name, (weights, chars) in sorted(typekey.RENDER_MODES.items()):
+        image = typekey.draw_bitmap(args.text, font, len(weights),
+                                    len(weights[0]))
+        assert (typekey.bitmap_to_lines_python(image, weights, chars) ==
+                typekey.bitmap_to_lines_numpy(image, weights, chars))
+        print('{} ({}x{} pixels):'.format(name, *image.size))
+        for converter in [
+                typekey.bitmap_to_lines_python, typekey.bitmap_to_lines_numpy
+        ]:
+            seconds = timeit.timeit(
+                lambda: converter(image, weights, chars), number=args.number)
+            print('  {:24} {:8.3f} ms'.format(converter.__name__,
+                                              seconds * 1000 / args.number))
+
+
+if __name__ == '__main__':
+    main()
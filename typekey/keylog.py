@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import struct
+
+MAGIC = b'TYPEKEY1'
+# timestamp, expected char, typed key code, seconds from the frame being shown
+# to the key press, seconds rendering the next frame, seconds from the key
+# press to the next frame being shown
+RECORD = struct.Struct('<dIifff')
+RECORDS_PER_READ = 4096
+
+
+class KeyLog:
+    ''' Append-only binary log of the keystrokes of a session'''
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def write(self, timestamp: float, expected: str, typed: int,
+              response_time: float, render_time: float,
+              refresh_time: float) -> None:
+        self._file.write(
+            RECORD.pack(timestamp, ord(expected), typed, response_time,
+                        render_time, refresh_time))
+        # keep the log complete even if the kiosk is switched off
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_records(path: str):
+    ''' Yields (timestamp, expected, typed, response_time, render_time,
+    refresh_time) without loading the whole log'''
+    with open(path, 'rb') as f:
+        assert f.read(len(MAGIC)) == MAGIC, path + ' is not a keystroke log'
+        while True:
+            chunk = f.read(RECORD.size * RECORDS_PER_READ)
+            # ignore a record truncated by a crash
+            chunk = chunk[:len(chunk) - len(chunk) % RECORD.size]
+            if not chunk:
+                return
+            for (timestamp, expected, typed, response_time, render_time,
+                 refresh_time) in RECORD.iter_unpack(chunk):
+                yield (timestamp, chr(expected), typed, response_time,
+                       render_time, refresh_time)
+
+
+class CharStats:
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.response_time = 0.0
+        self.render_time = 0.0
+        self.refresh_time = 0.0
+
+    def add(self, is_correct: bool, response_time: float, render_time: float,
+            refresh_time: float) -> None:
+        self.count += 1
+        if not is_correct:
+            self.errors += 1
+        self.response_time += response_time
+        self.render_time += render_time
+        self.refresh_time += refresh_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Per letter speed and errors of keystroke logs')
+    parser.add_argument('logs', nargs='+')
+    args = parser.parse_args()
+
+    stats = collections.defaultdict(CharStats)
+    for path in args.logs:
+        for (_, expected, typed, response_time, render_time,
+             refresh_time) in read_records(path):
+            is_correct = (0 <= typed < 0x110000 and
+                          chr(typed).upper() == expected.upper())
+            stats[expected].add(is_correct, response_time, render_time,
+                                refresh_time)
+
+    print('{:4} {:>7} {:>7} {:>12} {:>10} {:>11}'.format(
+        'char', 'count', 'errors', 'response_ms', 'render_ms', 'refresh_ms'))
+    for char, char_stats in sorted(stats.items()):
+        print('{:4} {:7d} {:6.1f}% {:12.0f} {:10.2f} {:11.2f}'.format(
+            char, char_stats.count, 100 * char_stats.errors / char_stats.count,
+            1000 * char_stats.response_time / char_stats.count,
+            1000 * char_stats.render_time / char_stats.count,
+            1000 * char_stats.refresh_time / char_stats.count))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 
 import argparse
 import curses
+import functools
 import random
 import string
 import subprocess
@@ -11,64 +12,203 @@ import time
 import os
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def ascii_art(text: str, prefex_length: int, font_size: int, square_font: bool,
+import train
+from keylog import KeyLog
+
+
+FONT_PATH = '/usr/share/fonts/truetype/freefont/FreeSans.ttf'
+
+# A cell of the ascii art covers len(weights) x len(weights[0]) pixels. Every
+# inked pixel adds its weight to the index of the cell's char.
+FULL_BLOCK = (((1,),), ' █')
+HALF_BLOCK = (((1,), (2,)), ' ▀▄█')
+QUADRANT = (((1, 2), (4, 8)), ' ▘▝▀▖▌▞▛▗▚▐▜▄▙▟█')
+BRAILLE = (((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80)),
+           ' ' + ''.join(chr(0x2800 + i) for i in range(1, 256)))
+RENDER_MODES = {
+    'square': FULL_BLOCK,
+    'half': HALF_BLOCK,
+    'quadrant': QUADRANT,
+    'braille': BRAILLE,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(font_size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(FONT_PATH, font_size)
+
+
+def draw_bitmap(text: str, font: ImageFont.FreeTypeFont, cell_height: int,
+                cell_width: int) -> Image.Image:
+    ''' Returns the text drawn in black on white, padded to whole cells'''
+    width, height = font.getsize(text)
+    # round up to whole cells
+    width += -width % cell_width
+    height += -height % cell_height
+    image = Image.new('1', (width, height), 1)
+    draw = ImageDraw.Draw(image)
+    draw.text((0, 0), text, font=font)
+    return image
+
+
+def bitmap_to_lines_python(image: Image.Image, weights: tuple,
+                           chars: str) -> tuple:
+    pixels = image.load()
+    width, height = image.size
+    cell_height = len(weights)
+    cell_width = len(weights[0])
+    result = []
+    for row in range(0, height, cell_height):
+        line = []
+        for col in range(0, width, cell_width):
+            index = 0
+            for dy, row_weights in enumerate(weights):
+                for dx, weight in enumerate(row_weights):
+                    if not pixels[col + dx, row + dy]:
+                        index += weight
+            line.append(chars[index])
+        result.append(''.join(line))
+    return tuple(result)
+
+
+def bitmap_to_lines_numpy(image: Image.Image, weights: tuple,
+                          chars: str) -> tuple:
+    weights = numpy.array(weights, dtype=numpy.uint8)
+    cell_height, cell_width = weights.shape
+    ink = numpy.logical_not(numpy.asarray(image))
+    height, width = ink.shape
+    cells = ink.reshape(height // cell_height, cell_height,
+                        width // cell_width, cell_width)
+    index = (cells * weights[numpy.newaxis, :, numpy.newaxis, :]).sum(
+        axis=(1, 3))
+    table = numpy.array([ord(c) for c in chars], dtype=numpy.uint32)
+    codes = numpy.ascontiguousarray(table[index])
+    # reinterpret every row of code points as one unicode string
+    return tuple(codes.view('<U%d' % codes.shape[1]).ravel().tolist())
+
+
+def bitmap_to_lines(image: Image.Image, weights: tuple, chars: str) -> tuple:
+    if numpy is None:
+        return bitmap_to_lines_python(image, weights, chars)
+    return bitmap_to_lines_numpy(image, weights, chars)
+
+
+def fit_font_size(text: str, font_size: int, max_width: int) -> int:
+    ''' Returns the largest size up to font_size that fits in max_width'''
+    if load_font(font_size).getsize(text)[0] <= max_width:
+        return font_size
+    low = 1
+    high = font_size - 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if load_font(mid).getsize(text)[0] <= max_width:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def fit_font_sizes(words: list, font_size: int, render_mode: str,
+                   max_width: int) -> dict:
+    weights, _ = RENDER_MODES[render_mode]
+    return {
+        word: fit_font_size(word, font_size, max_width * len(weights[0]))
+        for word in set(words)
+    }
+
+
+@functools.lru_cache(maxsize=256)
+def rasterize(text: str, font_size: int, render_mode: str,
+              max_width: int) -> (tuple, tuple):
+    ''' Returns the ascii chars and the width of every prefix of text, the
+    whole text included'''
+    weights, chars = RENDER_MODES[render_mode]
+    cell_height = len(weights)
+    cell_width = len(weights[0])
+    font = load_font(fit_font_size(text, font_size, max_width * cell_width))
+    # round the prefix widths to the nearest cell
+    prefix_widths = tuple(
+        (font.getsize(text[:length])[0] + cell_width // 2) // cell_width
+        for length in range(len(text)))
+    image = draw_bitmap(text, font, cell_height, cell_width)
+    lines = bitmap_to_lines(image, weights, chars)
+    return lines, prefix_widths + (len(lines[0]),)
+
+
+def ascii_art(text: str, prefex_length: int, font_size: int, render_mode: str,
               max_width: int) -> (str, int):
     ''' Returns the ascii chars and the prefix width'''
-    while True:
-        font = ImageFont.truetype(
-            '/usr/share/fonts/truetype/freefont/FreeSans.ttf', font_size)
-        width, height = font.getsize(text)
-        if width <= max_width:
-            break
-        font_size -= 1
     assert prefex_length >= 0
-    assert prefex_length < len(text)
-    prefix_width, _ = font.getsize(text[:prefex_length])
-    if square_font:
-        image = Image.new('1', (width, height), 1)
-        draw = ImageDraw.Draw(image)
-        draw.text((0, 0), text, font=font)
-        result = []
-        for row in range(height):
-            line = ''
-            for col in range(width):
-                line += ' ' if image.getpixel((col, row)) else '█'
-            result.append(line)
-        return result, prefix_width
-    else:
-        # round up to even
-        height += height % 2
-        image = Image.new('1', (width, height), 1)
-        draw = ImageDraw.Draw(image)
-        draw.text((0, 0), text, font=font)
-        result = []
-        for half_row in range(height // 2):
-            line = ''
-            for col in range(width):
-                top = image.getpixel((col, half_row * 2))
-                bottom = image.getpixel((col, half_row * 2 + 1))
-                if top:
-                    if bottom:
-                        line += ' '
-                    else:
-                        line += '▄'
-                else:
-                    if bottom:
-                        line += '▀'
-                    else:
-                        line += '█'
-            result.append(line)
-        return result, prefix_width
+    assert prefex_length <= len(text)
+    lines, prefix_widths = rasterize(text, font_size, render_mode, max_width)
+    return lines, prefix_widths[prefex_length]
+
+
+class ArtRenderer:
+    ''' Keeps the drawn ascii art and recolors only the changed columns'''
+
+    def __init__(self, stdscr):
+        self._stdscr = stdscr
+        self._lines = None
+        self._done_width = 0
+        self._top = 0
+        self._left = 0
+
+    def invalidate(self) -> None:
+        self._lines = None
+
+    def draw(self, lines: tuple, done_width: int) -> None:
+        if lines != self._lines:
+            self._redraw(lines, done_width)
+        elif done_width > self._done_width:
+            self._recolor(self._done_width, done_width, curses.color_pair(2))
+        elif done_width < self._done_width:
+            self._recolor(done_width, self._done_width, curses.color_pair(3))
+        self._done_width = done_width
+        self._stdscr.noutrefresh()
+        curses.doupdate()
+
+    def _redraw(self, lines: tuple, done_width: int) -> None:
+        scr_height, scr_width = self._stdscr.getmaxyx()
+        self._lines = lines
+        self._top = (scr_height - len(lines)) // 2
+        self._left = (scr_width - len(lines[0])) // 2
+        self._stdscr.erase()
+        for i, line in enumerate(lines):
+            self._stdscr.addstr(self._top + i, self._left, line[:done_width],
+                                curses.color_pair(2))
+            self._stdscr.addstr(self._top + i, self._left + done_width,
+                                line[done_width:], curses.color_pair(3))
+
+    def _recolor(self, begin: int, end: int, attr: int) -> None:
+        for i in range(len(self._lines)):
+            self._stdscr.chgat(self._top + i, self._left + begin, end - begin,
+                               attr)
 
 
 def main(stdscr):
     parser = argparse.ArgumentParser(description='Typing')
     parser.add_argument('--font_size', type=int, default=48)
-    parser.add_argument('--square_font', action='store_true')
+    parser.add_argument(
+        '--square_font',
+        action='store_true',
+        help='same as --render_mode square')
+    parser.add_argument(
+        '--render_mode', choices=sorted(RENDER_MODES), default='half')
     parser.add_argument(
         '--charset', default='upper', help='e.g. upper,lower,digits,jeremy')
+    parser.add_argument(
+        '--keylog_dir',
+        default=os.path.expanduser('~/.cache/kids-keyboard/typekey'),
+        help='where to log the keystrokes of the session, empty to disable')
     args = parser.parse_args()
+    if args.square_font:
+        args.render_mode = 'square'
 
     random.seed()
     self_dir = os.path.dirname(os.path.realpath(__file__))
@@ -104,67 +244,122 @@ def main(stdscr):
         else:
             words += [word.upper() for word in words]
     assert words
-    while True:
-        curses.init_pair(2, curses.COLOR_YELLOW, curses.COLOR_BLACK)
-        curses.init_pair(3, curses.COLOR_WHITE, curses.COLOR_BLACK)
-        curses.curs_set(False)
-        stdscr.clear()
+    keylog = None
+    if args.keylog_dir:
+        os.makedirs(args.keylog_dir, exist_ok=True)
+        keylog = KeyLog(
+            os.path.join(args.keylog_dir,
+                         time.strftime('%Y%m%d-%H%M%S') + '.log'))
+    font_sizes = fit_font_sizes(words, args.font_size,
+                                args.render_mode, scr_width)
+    renderer = ArtRenderer(stdscr)
+    next_word = False
+    try:
         while True:
-            c = stdscr.getch()
-            if c == 27:  # ESC
-                return
-            if c == 32:  # SPACE
-                break
-        word = random.choice(words)
-        done_length = 0
-        word_start_time = time.time()
-        while done_length < len(word):
+            curses.init_pair(2, curses.COLOR_YELLOW, curses.COLOR_BLACK)
+            curses.init_pair(3, curses.COLOR_WHITE, curses.COLOR_BLACK)
+            curses.curs_set(False)
             stdscr.clear()
-            # draw
-            lines, done_width = ascii_art(word, done_length, args.font_size,
-                                          args.square_font, scr_width)
-            for i, line in enumerate(lines):
-                stdscr.addstr((scr_height - len(lines)) // 2 + i,
-                              (scr_width - len(line)) // 2, line[:done_width],
-                              curses.color_pair(2))
-                stdscr.addstr((scr_height - len(lines)) // 2 + i,
-                              (scr_width - len(line)) // 2 + done_width,
-                              line[done_width:], curses.color_pair(3))
-            # get input
-            c = stdscr.getch()
+            while not next_word:
+                c = stdscr.getch()
+                if c == 27:  # ESC
+                    return
+                if c == 32:  # SPACE
+                    break
+                if c == curses.KEY_RESIZE:
+                    scr_height, scr_width = stdscr.getmaxyx()
+                    font_sizes = fit_font_sizes(words, args.font_size,
+                                               args.render_mode, scr_width)
+            word = random.choice(words)
+            done_length = 0
+            word_start_time = time.time()
+            renderer.invalidate()
+            # the last keystroke, logged once its frame is shown
+            keystroke = None
+            key_time = None
+            while True:
+                # draw, the finished word too so that its last key gets a frame
+                render_start_time = time.monotonic()
+                lines, done_width = ascii_art(word, done_length,
+                                              font_sizes[word],
+                                              args.render_mode, scr_width)
+                render_time = time.monotonic() - render_start_time
+                renderer.draw(lines, done_width)
+                shown_time = time.monotonic()
+                if keylog and keystroke:
+                    keylog.write(*keystroke, render_time,
+                                 shown_time - key_time)
+                keystroke = None
+                if done_length == len(word):
+                    break
+                # get input
+                c = stdscr.getch()
+                key_time = time.monotonic()
+                if c == 27:  # ESC
+                    return
+                if c == curses.KEY_RESIZE:
+                    scr_height, scr_width = stdscr.getmaxyx()
+                    font_sizes = fit_font_sizes(words, args.font_size,
+                                               args.render_mode, scr_width)
+                    renderer.invalidate()
+                    continue
+                keystroke = (time.time(), word[done_length], c,
+                             key_time - shown_time)
+                if chr(c).upper() == word[done_length].upper():
+                    done_length += 1
+                else:
+                    # the blank screen is the frame of a wrong key, log it
+                    # before the penalty
+                    render_start_time = time.monotonic()
+                    stdscr.clear()
+                    render_time = time.monotonic() - render_start_time
+                    stdscr.refresh()
+                    if keylog:
+                        keylog.write(*keystroke, render_time,
+                                     time.monotonic() - key_time)
+                    keystroke = None
+                    time.sleep(2)
+                    curses.flushinp()
+                    renderer.invalidate()
+            duration = time.time() - word_start_time
+            proc = subprocess.Popen(
+                ['mplayer', random.choice(sounds)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL)
+            if duration < 1 * len(word):
+                trains = [
+                    train.Train(little=False, flying=True),
+                    train.Train(little=True, flying=True),
+                    train.Train(little=True, flying=True)
+                ]
+            elif duration < 2 * len(word):
+                trains = [
+                    train.Train(little=False, flying=False),
+                    train.Train(little=True, flying=False),
+                    train.Train(little=True, flying=False)
+                ]
+            elif duration < 3 * len(word):
+                trains = [
+                    train.Train(little=False, flying=False),
+                    train.Train(little=True, flying=False)
+                ]
+            else:
+                trains = [train.Train(little=False, flying=False)]
+            c = train.ride(stdscr, trains)
+            proc.kill()
+            # the ride drops KEY_RESIZE, but the screen size is up to date
+            if stdscr.getmaxyx()[1] != scr_width:
+                scr_height, scr_width = stdscr.getmaxyx()
+                font_sizes = fit_font_sizes(words, args.font_size,
+                                            args.render_mode, scr_width)
             if c == 27:  # ESC
                 return
-            if chr(c).upper() == word[done_length].upper():
-                done_length += 1
-            else:
-                stdscr.clear()
-                stdscr.refresh()
-                time.sleep(2)
-                curses.flushinp()
-        duration = time.time() - word_start_time
-        stdscr.clear()
-        curses.endwin()
-        proc = subprocess.Popen(
-            ['mplayer', random.choice(sounds)],
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL)
-        if duration < 1 * len(word):
-            subprocess.check_call(['sl', '-F'])
-            subprocess.check_call(['sl', '-l', '-F'])
-            subprocess.check_call(['sl', '-l', '-F'])
-        elif duration < 2 * len(word):
-            subprocess.check_call(['sl'])
-            subprocess.check_call(['sl', '-l'])
-            subprocess.check_call(['sl', '-l'])
-        elif duration < 3 * len(word):
-            subprocess.check_call(['sl'])
-            subprocess.check_call(['sl', '-l'])
-        else:
-            subprocess.check_call(['sl'])
-        proc.kill()
-        stdscr = curses.initscr()
-        curses.start_color()
+            # SPACE skips the rest of the ride and starts the next word
+            next_word = c == 32
+    finally:
+        if keylog:
+            keylog.close()
 
 
 if __name__ == '__main__':
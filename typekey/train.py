@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import curses
+import time
+
+SMOKE = [
+    [
+        r'       (@@)  (  )   (@)   ( )',
+        r'     (   )',
+        r'    (@@)',
+    ],
+    [
+        r'       (  )  (@@)   ( )   (@)',
+        r'     (@@@)',
+        r'    (  )',
+    ],
+]
+
+LOCOMOTIVE = [
+    r'    ____',
+    r'    |  |      ____________',
+    r' ___|  |_____|  __    __  |___',
+    r'|  ________  | |__|  |__| |   |',
+    r'| |________| |____________|   |',
+    r'|_____________________________|__',
+]
+LOCOMOTIVE_WHEELS = [
+    [
+        r'  (O)--(O)--(O)       (O)  (O)  \_',
+        r'   \____/ \___/',
+    ],
+    [
+        r'  (O)==(O)==(O)       (O)  (O)  \_',
+        r'  /----\ /---\ ',
+    ],
+]
+
+LITTLE_LOCOMOTIVE = [
+    r'   __',
+    r'  |  |____',
+    r' _|  | [] |_',
+    r'|__________|_',
+]
+LITTLE_LOCOMOTIVE_WHEELS = [
+    [' (o)-(o)  (o)\\'],
+    [' (o)=(o)  (o)\\'],
+]
+
+FPS = 25
+
+
+class Train:
+    ''' A locomotive crossing the screen from right to left, like sl'''
+
+    def __init__(self, little: bool, flying: bool) -> None:
+        if little:
+            self._body = LITTLE_LOCOMOTIVE
+            self._wheels = LITTLE_LOCOMOTIVE_WHEELS
+        else:
+            self._body = LOCOMOTIVE
+            self._wheels = LOCOMOTIVE_WHEELS
+        self._flying = flying
+        self._height = len(SMOKE[0]) + len(self._body) + len(self._wheels[0])
+        self._width = max(
+            len(line) for line in SMOKE[0] + self._body + self._wheels[0])
+
+    def num_frames(self, scr_width: int) -> int:
+        return scr_width + self._width
+
+    def draw(self, stdscr, frame: int) -> None:
+        scr_height, scr_width = stdscr.getmaxyx()
+        x = scr_width - frame
+        y = (scr_height - self._height) // 2
+        if self._flying:
+            # climb one row every four columns, starting from the bottom
+            y = scr_height - self._height + (x - scr_width) // 4
+        lines = (SMOKE[frame // 4 % len(SMOKE)] + self._body +
+                 self._wheels[frame % len(self._wheels)])
+        for i, line in enumerate(lines):
+            row = y + i
+            if row < 0 or row >= scr_height:
+                continue
+            visible = line[max(0, -x):scr_width - x]
+            if not visible:
+                continue
+            try:
+                stdscr.addstr(row, max(0, x), visible)
+            except curses.error:
+                # writing the bottom right cell moves the cursor off screen
+                pass
+
+
+def ride(stdscr, trains: list, fps: int = FPS) -> int:
+    ''' Runs the trains one after another within the curses session.
+
+    Returns the key that stopped the ride early (SPACE or ESC), or -1 if all
+    the trains reached the left edge.
+    '''
+    frame_duration = 1.0 / fps
+    deadline = time.monotonic()
+    try:
+        for train in trains:
+            _, scr_width = stdscr.getmaxyx()
+            for frame in range(train.num_frames(scr_width)):
+                stdscr.erase()
+                train.draw(stdscr, frame)
+                stdscr.noutrefresh()
+                curses.doupdate()
+                deadline += frame_duration
+                while True:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        # drop the lost time instead of rushing to catch up
+                        deadline = max(deadline, time.monotonic())
+                        break
+                    stdscr.timeout(int(timeout * 1000) + 1)
+                    c = stdscr.getch()
+                    if c == 27 or c == 32:  # ESC or SPACE
+                        return c
+    finally:
+        stdscr.timeout(-1)
+        stdscr.erase()
+    return -1
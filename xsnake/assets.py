@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+import glob
+import os
+
+import pygame
+
+SELF_DIR = os.path.dirname(os.path.realpath(__file__))
+# the scaled images of about 3 grid sizes, each level scales the 18 food
+# images, arrows.png and ending.png
+MAX_SCALED_IMAGES = 64
+
+
+@functools.lru_cache(maxsize=None)
+def food_image_files() -> tuple:
+    img_files = tuple(sorted(glob.glob(SELF_DIR + '/food_img/*.png')))
+    assert img_files
+    return img_files
+
+
+@functools.lru_cache(maxsize=None)
+def load_image(path: str) -> pygame.Surface:
+    ''' Decodes the image once per process, in the pixel format of the display.
+
+    The display mode must be set before, and must not change afterwards.
+    '''
+    return pygame.image.load(path).convert_alpha()
+
+
+@functools.lru_cache(maxsize=MAX_SCALED_IMAGES)
+def scaled_image(path: str, size: int) -> pygame.Surface:
+    ''' Returns the image scaled to size x size, in the display format'''
+    return pygame.transform.scale(load_image(path), (size, size))
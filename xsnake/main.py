@@ -3,28 +3,77 @@
 
 import argparse
 import glob
+import itertools
+import multiprocessing
 import os
 import pygame
 import random
 import subprocess
 import time
 
+import assets
 import maze_map
+import music_bank
+import profiler
+import replay
+import snake_core
 
 MIN_MARGIN = 32
 PROGRESS_BAR_HEIGHT = 8
 SELF_DIR = os.path.dirname(os.path.realpath(__file__))
+HINT_COLOR = pygame.Color(200, 200, 60)
+OVERLAY_FONT_SIZE = 20
+# the profile summary on the screen is rendered at most this often
+OVERLAY_INTERVAL = 0.5
+# the screen is drawn at most this often
+MAX_FPS = 60
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_KP4: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_KP6: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_KP8: (0, -1),
+    pygame.K_DOWN: (0, 1),
+    pygame.K_KP2: (0, 1)
+}
 
 
 class Game:
 
-    def __init__(self, map_size: int, maze: bool, video_ending: bool, surface):
+    def __init__(self,
+                 map_size: int,
+                 maze: bool,
+                 maze_generator: str,
+                 video_ending: bool,
+                 surface,
+                 music: music_bank.MusicBank,
+                 seed: int,
+                 level_map: maze_map.MazeMap = None,
+                 max_food_distance: int = 0,
+                 hint: bool = False,
+                 profile: profiler.Profiler = None):
         self._map_size = map_size
         self._surface = surface
         self._video_ending = video_ending
+        self._music = music
+        # the food images, the rules have their own
+        self._random = random.Random('render:{}'.format(seed))
 
         self._is_maze = maze
-        self._maze_map = maze_map.MazeMap(map_size, map_size, maze)
+        self._core = snake_core.SnakeCore(map_size, maze, maze_generator, seed,
+                                          level_map, max_food_distance)
+        self._profiler = profile
+        if profile:
+            profile.count_calls(self._core.maze_map(), 'is_connected',
+                                'is_connected')
+            self._overlay_font = pygame.font.Font(None, OVERLAY_FONT_SIZE)
+            self._overlay = None
+            self._overlay_rect = None
+            self._overlay_time = 0.0
+        self._hint = hint
+        # the cells between the head and the food that hint the way
+        self._hint_cells = set(self._core.path_to_food()) if hint else set()
 
         surface_width, surface_height = surface.get_size()
         assert surface_width >= surface_height
@@ -40,207 +89,481 @@ class Game:
         self._ending_img = self._load_ending_img()
         self._arrows_img = self._load_arrows_img()
         self._mplayer_proc = None
-        self._snake_pos = [(map_size // 2, map_size // 2)] * 2
-        self._food_pos = self._gen_food_pos()
-        self._food_img = random.choice(self._food_imgs)
-        self._is_ended = False
-        self._ending_length = min(
-            self._maze_map.x_size() * 2,
-            self._maze_map.x_size() * self._maze_map.y_size() // 2)
-
-        self._background_songs = glob.glob(SELF_DIR + '/bgmusic/*.mp3')
-        assert self._background_songs
-        random.shuffle(self._background_songs)
-        self._play_background_music()
+        self._food_img = self._random.choice(self._food_imgs)
+
+        if profile:
+            profile.start()
+        self._background = self._render_background()
+        if profile:
+            profile.lap('walls')
+        self._needs_full_redraw = True
+        self._dirty_rects = []
+
+        self._music.play_next()
 
     def __del__(self):
         if self._mplayer_proc:
             self._mplayer_proc.kill()
 
-    def _gen_food_pos(self):
-        while True:
-            food_pos = (random.randint(0,
-                                       self._maze_map.x_size() - 1),
-                        random.randint(0,
-                                       self._maze_map.y_size() - 1))
-            if food_pos not in self._snake_pos:
-                return food_pos
-
     def _load_food_imgs(self):
-        img_files = glob.glob(SELF_DIR + '/food_img/*.png')
-        assert img_files
-        imgs = []
-        for img_file in img_files:
-            imgs.append(
-                pygame.transform.scale(
-                    pygame.image.load(img_file),
-                    (self._grid_size, self._grid_size)))
-        return imgs
+        return [
+            assets.scaled_image(img_file, self._grid_size)
+            for img_file in assets.food_image_files()
+        ]
 
     def _load_ending_img(self):
         img_size = min(self._surface.get_size())
-        return pygame.transform.scale(
-            pygame.image.load(SELF_DIR + '/ending.png'), (img_size, img_size))
+        return assets.scaled_image(SELF_DIR + '/ending.png', img_size)
 
     def _load_arrows_img(self):
-        return pygame.transform.scale(
-            pygame.image.load(SELF_DIR + '/arrows.png'), (self._grid_size * 2, self._grid_size * 2))
-
-    def _play_background_music(self):
-        if self._is_ended:
-            pygame.mixer.music.load(SELF_DIR + '/ending.mp3')
-            pygame.mixer.music.set_volume(1.0)
-            pygame.mixer.music.play(-1)
-        else:
-            pygame.mixer.music.load(self._background_songs[0])
-            pygame.mixer.music.set_volume(0.3)
-            pygame.mixer.music.play(-1)
-            self._background_songs = self._background_songs[1:] + [
-                self._background_songs[0]
-            ]
-
-    def update(self, direction):
-        if self._is_ended:
-            return
-
-        if direction:
-            assert direction in self._maze_map.directions()
-
-            if not self._maze_map.is_connected(self._snake_pos[0], direction):
-                return
-            new_head_pos = (self._snake_pos[0][0] + direction[0],
-                            self._snake_pos[0][1] + direction[1])
-            if new_head_pos == self._food_pos:
-                self._snake_pos = [new_head_pos] + self._snake_pos
-                if len(self._snake_pos) >= self._ending_length:
-                    self._is_ended = True
-                    if self._video_ending:
-                        pygame.mixer.music.stop()
-                        self._mplayer_proc = subprocess.Popen(
-                            ['vlc', '-f', SELF_DIR + '/ending.mp4'])
-                    else:
-                        self._play_background_music()
-                else:
-                    self._food_pos = self._gen_food_pos()
-                    self._food_img = random.choice(self._food_imgs)
-                    self._play_background_music()
+        return assets.scaled_image(SELF_DIR + '/arrows.png',
+                                   self._grid_size * 2)
+
+    def move(self, direction) -> bool:
+        ''' Returns whether the snake moved, the screen changes on draw()'''
+        if self._core.is_ended():
+            return False
+        if self._profiler:
+            self._profiler.start()
+
+        # whatever was drawn on the cells that change
+        old_rects = [
+            self._arrows_rect(),
+            self._cell_rect(self._core.snake_pos()[-1]),
+            self._cell_rect(self._core.food_pos()),
+            self._progress_bar_rect()
+        ]
+        result = self._core.move(direction)
+        if result == snake_core.BLOCKED:
+            if self._profiler:
+                self._profiler.lap('move')
+            return False
+        if result == snake_core.ENDED:
+            if self._video_ending:
+                self._music.stop()
+                self._mplayer_proc = subprocess.Popen(
+                    ['vlc', '-f', SELF_DIR + '/ending.mp4'])
             else:
-                self._snake_pos = [new_head_pos] + self._snake_pos[:-1]
-
-        self._surface.fill(pygame.Color(0, 0, 0))
-
-        if self._is_ended:
+                self._music.play_ending()
+            self._needs_full_redraw = True
+        elif result == snake_core.ATE:
+            self._food_img = self._random.choice(self._food_imgs)
+            self._music.play_next()
+        self._dirty_rects += old_rects + [
+            self._arrows_rect(),
+            self._cell_rect(self._core.food_pos())
+        ]
+        if self._hint:
+            hint_cells = set(self._core.path_to_food())
+            # most of the path stays the same
+            self._dirty_rects += [
+                self._cell_rect(pos)
+                for pos in hint_cells ^ self._hint_cells
+            ]
+            self._hint_cells = hint_cells
+        if self._profiler:
+            self._profiler.lap('move')
+        return True
+
+    def draw(self) -> bool:
+        ''' Draws what changed since the last draw, returns whether anything
+        did'''
+        if not self._needs_full_redraw and not self._dirty_rects:
+            return False
+        if self._core.is_ended():
+            self._surface.fill(pygame.Color(0, 0, 0))
             surface_width, surface_height = self._surface.get_size()
             assert surface_width >= surface_height
             self._surface.blit(self._ending_img,
                                ((surface_width - surface_height) // 2, 0))
+            pygame.display.flip()
+            self._needs_full_redraw = False
+            self._dirty_rects = []
         else:
-            grid_color = pygame.Color(
-                20, 20, 20) if self._is_maze else pygame.Color(70, 70, 70)
-            wall_color = pygame.Color(255, 255, 255)
-            body_color = pygame.Color(
-                80, 160, 80) if self._is_maze else pygame.Color(30, 60, 30)
+            self._draw()
+        return True
+
+    def _update_overlay(self):
+        ''' Renders the profile summary again if it is old, and marks where it
+        is drawn dirty'''
+        now = time.monotonic()
+        if self._overlay and now - self._overlay_time < OVERLAY_INTERVAL:
+            return
+        self._overlay_time = now
+        lines = [
+            self._overlay_font.render(line, True, pygame.Color(255, 255, 0),
+                                      pygame.Color(0, 0, 0))
+            for line in self._profiler.summary_lines()
+        ]
+        overlay = pygame.Surface(
+            (max(line.get_width() for line in lines),
+             sum(line.get_height() for line in lines))).convert()
+        y = 0
+        for line in lines:
+            overlay.blit(line, (0, y))
+            y += line.get_height()
+        rect = overlay.get_rect(topleft=(4, PROGRESS_BAR_HEIGHT + 4))
+        if not self._needs_full_redraw:
+            self._dirty_rects.append(
+                rect.union(self._overlay_rect) if self._overlay_rect else rect)
+        self._overlay = overlay
+        self._overlay_rect = rect
+
+    def redraw(self):
+        ''' Draws the whole surface again on the next draw()'''
+        self._needs_full_redraw = True
+
+    def _render_background(self):
+        ''' Returns the grid and the walls, which do not change in a level'''
+        background = self._surface.copy()
+        background.fill(pygame.Color(0, 0, 0))
+        grid_color = pygame.Color(
+            20, 20, 20) if self._is_maze else pygame.Color(70, 70, 70)
+        wall_color = pygame.Color(255, 255, 255)
+        for x in range(self._map_size + 1):
+            pygame.draw.line(background, grid_color,
+                             (self._left + x * self._grid_size, self._top),
+                             (self._left + x * self._grid_size,
+                              self._top + self._map_size * self._grid_size))
+        for y in range(self._map_size + 1):
+            pygame.draw.line(background, grid_color,
+                             (self._left, self._top + y * self._grid_size),
+                             (self._left + self._map_size * self._grid_size,
+                              self._top + y * self._grid_size))
+        # one byte per cell, at x * map_size + y
+        west_connections = self._core.maze_map().connections((-1, 0))
+        north_connections = self._core.maze_map().connections((0, -1))
+        for x in range(self._map_size + 1):
+            for y in range(self._map_size):
+                if (x == self._map_size or
+                        not west_connections[x * self._map_size + y]):
+                    pygame.draw.line(
+                        background, wall_color,
+                        (self._left + x * self._grid_size,
+                         self._top + y * self._grid_size),
+                        (self._left + x * self._grid_size,
+                         self._top + (y + 1) * self._grid_size), 3)
+        for y in range(self._map_size + 1):
+            for x in range(self._map_size):
+                if (y == self._map_size or
+                        not north_connections[x * self._map_size + y]):
+                    pygame.draw.line(
+                        background, wall_color,
+                        (self._left + x * self._grid_size,
+                         self._top + y * self._grid_size),
+                        (self._left + (x + 1) * self._grid_size,
+                         self._top + y * self._grid_size), 3)
+        return background
+
+    def _cell_rect(self, pos):
+        return pygame.Rect(self._left + pos[0] * self._grid_size,
+                           self._top + pos[1] * self._grid_size,
+                           self._grid_size, self._grid_size)
+
+    def _cell_center(self, pos):
+        return (self._left + pos[0] * self._grid_size +
+                self._grid_size // 2 + 1, self._top +
+                pos[1] * self._grid_size + self._grid_size // 2 + 1)
+
+    def _arrows_rect(self):
+        head_pos = self._core.snake_pos()[0]
+        return self._arrows_img.get_rect(topleft=(
+            int(self._left + (head_pos[0] - 0.5) * self._grid_size),
+            int(self._top + (head_pos[1] - 0.5) * self._grid_size)))
+
+    def _progress_bar_rect(self):
+        return pygame.Rect(0, 0, self._surface.get_width(),
+                           PROGRESS_BAR_HEIGHT)
+
+    def _cells_in(self, rect):
+        ''' Returns the positions of the cells that overlap rect'''
+        x_begin = max(0, (rect.left - self._left) // self._grid_size)
+        x_end = min(self._map_size,
+                    (rect.right - 1 - self._left) // self._grid_size + 1)
+        y_begin = max(0, (rect.top - self._top) // self._grid_size)
+        y_end = min(self._map_size,
+                    (rect.bottom - 1 - self._top) // self._grid_size + 1)
+        return [(x, y) for x in range(x_begin, x_end)
+                for y in range(y_begin, y_end)]
+
+    def _draw(self):
+        ''' Draws the dirty rects over the cached background'''
+        if self._needs_full_redraw:
+            self._dirty_rects = [self._surface.get_rect()]
+        profile = self._profiler
+        if profile:
+            profile.start()
+            self._update_overlay()
+            profile.lap('overlay')
+        body_color = pygame.Color(
+            80, 160, 80) if self._is_maze else pygame.Color(30, 60, 30)
+        radius = int(self._grid_size * 0.3)
+        hint_radius = max(1, int(self._grid_size * 0.1))
+        snake_pos = self._core.snake_pos()
+        head_pos = snake_pos[0]
+        food_rect = self._cell_rect(self._core.food_pos())
+        arrows_rect = self._arrows_rect()
+        for rect in self._dirty_rects:
+            self._surface.set_clip(rect)
+            self._surface.blit(self._background, rect, rect)
 
             # progress bar
             progress_bar_length = self._surface.get_width() * len(
-                self._snake_pos) // self._ending_length
-            self._surface.fill(pygame.Color(100, 255, 100),
-                               pygame.Rect(0, 0, progress_bar_length, PROGRESS_BAR_HEIGHT))
-
-            for x in range(self._map_size + 1):
-                pygame.draw.line(self._surface, grid_color,
-                                 (self._left + x * self._grid_size, self._top),
-                                 (self._left + x * self._grid_size,
-                                  self._top + self._map_size * self._grid_size))
-            for y in range(self._map_size + 1):
-                pygame.draw.line(self._surface, grid_color,
-                                 (self._left, self._top + y * self._grid_size),
-                                 (self._left + self._map_size * self._grid_size,
-                                  self._top + y * self._grid_size))
-            for x in range(self._map_size + 1):
-                for y in range(self._map_size):
-                    if x == self._map_size or not self._maze_map.is_connected(
-                            (x, y), (-1, 0)):
-                        pygame.draw.line(
-                            self._surface, wall_color,
-                            (self._left + x * self._grid_size,
-                             self._top + y * self._grid_size),
-                            (self._left + x * self._grid_size,
-                             self._top + (y + 1) * self._grid_size), 3)
-            for y in range(self._map_size + 1):
-                for x in range(self._map_size):
-                    if y == self._map_size or not self._maze_map.is_connected(
-                            (x, y), (0, -1)):
-                        pygame.draw.line(
-                            self._surface, wall_color,
-                            (self._left + x * self._grid_size,
-                             self._top + y * self._grid_size),
-                            (self._left + (x + 1) * self._grid_size,
-                             self._top + y * self._grid_size), 3)
-
-            for i, pos in reversed(list(enumerate(self._snake_pos[1:]))):
-                radius = int(self._grid_size * 0.3)
-                pygame.draw.circle(
-                    self._surface, body_color,
-                    (self._left + pos[0] * self._grid_size +
-                     self._grid_size // 2 + 1, self._top +
-                     pos[1] * self._grid_size + self._grid_size // 2 + 1),
-                    radius)
-
-            self._surface.blit(
-                self._food_img,
-                (self._left + self._food_pos[0] * self._grid_size,
-                 self._top + self._food_pos[1] * self._grid_size))
-
-            self._surface.blit(
-                self._arrows_img,
-                (self._left + (self._snake_pos[0][0] - 0.5) * self._grid_size,
-                 self._top + (self._snake_pos[0][1] - 0.5) * self._grid_size))
-
-        pygame.display.flip()
+                snake_pos) // self._core.ending_length()
+            self._surface.fill(
+                pygame.Color(100, 255, 100),
+                pygame.Rect(0, 0, progress_bar_length, PROGRESS_BAR_HEIGHT))
+            if profile:
+                profile.lap('background')
+                profile.count('draw_calls', 2)
+
+            if self._needs_full_redraw:
+                hint = self._hint_cells
+            else:
+                cells = self._cells_in(rect)
+                hint = [pos for pos in cells if pos in self._hint_cells]
+            num_draw_calls = 0
+            for pos in hint:
+                pygame.draw.circle(self._surface, HINT_COLOR,
+                                   self._cell_center(pos), hint_radius)
+                num_draw_calls += 1
+            if profile:
+                profile.lap('hint')
+
+            if self._needs_full_redraw:
+                body = itertools.islice(snake_pos, 1, None)
+            else:
+                # the head is drawn by the arrows, unless the body is under it
+                body = [
+                    pos for pos in cells
+                    if self._core.count(pos) > (pos == head_pos)
+                ]
+            for pos in body:
+                pygame.draw.circle(self._surface, body_color,
+                                   self._cell_center(pos), radius)
+                num_draw_calls += 1
+            if profile:
+                profile.lap('body')
+
+            if rect.colliderect(food_rect):
+                self._surface.blit(self._food_img, food_rect)
+                num_draw_calls += 1
+            if rect.colliderect(arrows_rect):
+                self._surface.blit(self._arrows_img, arrows_rect)
+                num_draw_calls += 1
+            if profile:
+                if rect.colliderect(self._overlay_rect):
+                    self._surface.blit(self._overlay, self._overlay_rect)
+                    num_draw_calls += 1
+                profile.lap('sprites')
+                profile.count('draw_calls', num_draw_calls)
+        self._surface.set_clip(None)
+
+        if self._needs_full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._dirty_rects)
+        self._needs_full_redraw = False
+        self._dirty_rects = []
+        if profile:
+            profile.lap('flip')
+            profile.end_frame()
 
     def is_ended(self) -> bool:
-        return self._is_ended
+        return self._core.is_ended()
+
+
+class LevelMaker:
+    ''' Generates the maze of the next level in another process while the
+    current level is played, so that starting it does not freeze the screen.
+
+    Every level gets the next seed of random.Random(seed).
+    '''
+
+    def __init__(self, maze: bool, maze_generator: str, seed: int) -> None:
+        self._maze = maze
+        self._maze_generator = maze_generator
+        self._level_seeds = random.Random(seed)
+        # a fresh process, not a fork of this one with its SDL threads
+        self._pool = multiprocessing.get_context('forkserver').Pool(1)
+        # the map size, the seed and the async result maze of the next level
+        self._next_level = None
+
+    def make(self, map_size: int) -> (int, maze_map.MazeMap):
+        ''' Returns the seed and the maze of the level, then starts generating
+        the next one.
+
+        The maze is None if it was not generated before.
+        '''
+        level_map = None
+        if self._next_level and self._next_level[0] == map_size:
+            _, seed, result = self._next_level
+            level_map = result.get()
+        else:
+            seed = self._level_seeds.getrandbits(32)
+        next_seed = self._level_seeds.getrandbits(32)
+        self._next_level = (map_size + 1, next_seed,
+                            self._pool.apply_async(
+                                snake_core.gen_maze_map,
+                                (map_size + 1, self._maze,
+                                 self._maze_generator, next_seed)))
+        return seed, level_map
+
+    def close(self) -> None:
+        ''' Drops the maze being generated, a big one takes seconds'''
+        self._pool.terminate()
+
+
+def replay_session(events, new_game, music, fps):
+    ''' Plays the recorded events through the renderer, fps = 0 as fast as
+    possible'''
+    game = new_game(False)
+    clock = pygame.time.Clock()
+    num_frames = 0
+    start = time.monotonic()
+    for event in events:
+        for input_event in pygame.event.get():
+            if input_event.type == pygame.QUIT or (
+                    input_event.type == pygame.KEYDOWN and
+                    input_event.key == pygame.K_q and
+                    pygame.key.get_mods() & pygame.KMOD_CTRL):
+                return
+            if input_event.type == music_bank.MUSIC_READY:
+                music.update()
+        if event == replay.NEXT_LEVEL:
+            del game
+            game = new_game(True)
+        else:
+            game.move(event)
+        game.draw()
+        num_frames += 1
+        if fps:
+            clock.tick(fps)
+    elapsed = time.monotonic() - start
+    print('frames: {} frames/s: {:.0f}'.format(num_frames,
+                                               num_frames / elapsed))
 
 
 def main():
     parser = argparse.ArgumentParser(description='Snake')
     parser.add_argument('--map_size', type=int, default=6)
     parser.add_argument('--maze', action='store_true')
+    parser.add_argument(
+        '--maze_generator',
+        choices=maze_map.MazeMap.GENERATORS,
+        default='kruskal')
     parser.add_argument('--video_ending', action='store_true')
+    parser.add_argument(
+        '--hint',
+        action='store_true',
+        help='show the shortest way from the head to the food')
+    parser.add_argument(
+        '--max_food_distance',
+        type=int,
+        default=0,
+        help='place the food at most this many moves away from the head, '
+        '0 for anywhere')
+    parser.add_argument(
+        '--seed', type=int, help='the same seed gives the same levels')
+    parser.add_argument('--record', help='replay file to record the session')
+    parser.add_argument(
+        '--profile',
+        metavar='CSV',
+        help='show frame timings on the screen, and write them to CSV on exit')
+    parser.add_argument(
+        '--replay', help='replay file to play instead of the keyboard')
+    parser.add_argument(
+        '--replay_fps',
+        type=float,
+        default=10,
+        help='moves per second of --replay, 0 for as fast as possible')
     args = parser.parse_args()
 
+    events = None
+    if args.replay:
+        header, events = replay.load_replay(args.replay)
+        args.map_size = header.map_size
+        args.maze = header.maze
+        args.maze_generator = header.maze_generator
+        args.seed = header.seed
+        args.max_food_distance = header.max_food_distance
+    elif args.seed is None:
+        args.seed = random.getrandbits(32)
+    recorder = None
+    if args.record:
+        recorder = replay.ReplayWriter(
+            args.record,
+            replay.ReplayHeader(args.map_size, args.maze, args.maze_generator,
+                                args.seed, args.max_food_distance))
+    level_maker = LevelMaker(args.maze, args.maze_generator, args.seed)
+    profile = profiler.Profiler() if args.profile else None
+
     pygame.init()
     pygame.display.set_caption("Snake")
     pygame.mouse.set_visible(False)
     surface = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-    game = Game(args.map_size, args.maze, args.video_ending, surface)
-
-    while True:
-        event = pygame.event.wait()
-        if event.type == pygame.QUIT:
-            break
-        direction = None
-        if event.type == pygame.KEYDOWN:
+    songs = glob.glob(SELF_DIR + '/bgmusic/*.mp3')
+    random.shuffle(songs)
+    music = music_bank.MusicBank(songs, SELF_DIR + '/ending.mp3')
+
+    def new_game(next_level):
+        if next_level:
+            args.map_size += 1
+        seed, level_map = level_maker.make(args.map_size)
+        return Game(args.map_size, args.maze, args.maze_generator,
+                    args.video_ending, surface, music, seed, level_map,
+                    args.max_food_distance, args.hint, profile)
+
+    if events is not None:
+        replay_session(events, new_game, music, args.replay_fps)
+        if profile:
+            profile.write_csv(args.profile)
+        music.close()
+        level_maker.close()
+        pygame.quit()
+        return
+
+    game = new_game(False)
+    # the snake follows the keys, not the mouse
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+    clock = pygame.time.Clock()
+    is_running = True
+    while is_running:
+        # handle every pending event, then draw at most once
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                is_running = False
+                break
+            if event.type == pygame.VIDEOEXPOSE:
+                game.redraw()
+            if event.type == music_bank.MUSIC_READY:
+                music.update()
+            if event.type != pygame.KEYDOWN:
+                continue
             mods = pygame.key.get_mods()
             if mods & pygame.KMOD_CTRL and event.key == pygame.K_q:
+                is_running = False
                 break
             if event.key == pygame.K_SPACE and game.is_ended():
                 del game
-                args.map_size += 1
-                game = Game(args.map_size, args.maze, args.video_ending,
-                            surface)
-                continue
-            if event.key == pygame.K_LEFT or event.key == pygame.K_KP4:
-                direction = (-1, 0)
-            elif event.key == pygame.K_RIGHT or event.key == pygame.K_KP6:
-                direction = (1, 0)
-            elif event.key == pygame.K_UP or event.key == pygame.K_KP8:
-                direction = (0, -1)
-            elif event.key == pygame.K_DOWN or event.key == pygame.K_KP2:
-                direction = (0, 1)
-        game.update(direction)
-
+                game = new_game(True)
+                if recorder:
+                    recorder.next_level()
+            elif event.key in KEY_DIRECTIONS:
+                direction = KEY_DIRECTIONS[event.key]
+                if recorder:
+                    recorder.move(direction)
+                game.move(direction)
+        if is_running and game.draw():
+            # the events that come in the rest of the frame are coalesced
+            clock.tick(MAX_FPS)
+
+    if recorder:
+        recorder.close()
+    if profile:
+        profile.write_csv(args.profile)
+    music.close()
+    level_maker.close()
     pygame.quit()
 
 
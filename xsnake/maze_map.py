@@ -2,41 +2,101 @@
 # -*- coding: utf-8 -*-
 
 from typing import Tuple, List
+import collections
 import random
 
 
+# one bit per direction in which a cell is connected to its neighbor
+DIRECTION_BITS = {(1, 0): 0x1, (-1, 0): 0x2, (0, 1): 0x4, (0, -1): 0x8}
+# maps a cell byte to 1 if it is connected in the direction, else 0
+_CONNECTION_TABLES = {
+    direction: bytes(int(bool(cell & bit)) for cell in range(256))
+    for direction, bit in DIRECTION_BITS.items()
+}
+
+
 class MazeMap:
+    ''' The cells and their passages, one byte of DIRECTION_BITS per cell.
+
+    Cell (x, y) is at index x * y_size + y.
+    '''
 
-    def __init__(self, x_size: int, y_size: int, has_wall: bool) -> None:
+    GENERATORS = ['kruskal', 'random_walls']
+
+    def __init__(self,
+                 x_size: int,
+                 y_size: int,
+                 has_wall: bool,
+                 generator: str = 'kruskal',
+                 rng: random.Random = None) -> None:
+        ''' rng defaults to the random module'''
         assert x_size >= 2
         assert y_size >= 2
+        assert generator in self.GENERATORS
         self._x_size = x_size
         self._y_size = y_size
-        self._is_connected_to_next_x = [
-            [True] * y_size for i in range(x_size - 1)
-        ]
-        self._is_connected_to_next_y = [
-            [True] * (y_size - 1) for i in range(x_size)
-        ]
-        if not has_wall:
+        self._cells = bytearray(x_size * y_size)
+        self._random = rng or random
+        if has_wall and generator == 'kruskal':
+            self._gen_kruskal()
             return
-        is_connected_to_next = (self._is_connected_to_next_x,
-                                self._is_connected_to_next_y)
-        for i in range((x_size - 1) * (y_size - 1)):
+        for x in range(x_size):
+            for y in range(y_size):
+                for direction in self.directions():
+                    if self._is_inside((x + direction[0], y + direction[1])):
+                        self._cells[x * y_size + y] |= DIRECTION_BITS[direction]
+        if has_wall:
+            self._gen_random_walls()
+
+    def _gen_random_walls(self) -> None:
+        for i in range((self._x_size - 1) * (self._y_size - 1)):
             while True:
-                rand_dir = random.randint(0, 1)
-                if rand_dir == 0:
-                    rand_x = random.randint(0, self._x_size - 2)
-                    rand_y = random.randint(0, self._y_size - 1)
-                else:
-                    rand_x = random.randint(0, self._x_size - 1)
-                    rand_y = random.randint(0, self._y_size - 2)
-                if not is_connected_to_next[rand_dir][rand_x][rand_y]:
+                rand_dir = self._random.choice([(1, 0), (0, 1)])
+                rand_pos = (
+                    self._random.randint(0, self._x_size - 1 - rand_dir[0]),
+                    self._random.randint(0, self._y_size - 1 - rand_dir[1]))
+                if not self.is_connected(rand_pos, rand_dir):
                     continue
-                is_connected_to_next[rand_dir][rand_x][rand_y] = False
+                self._set_connected(rand_pos, rand_dir, False)
                 if self._is_connected():
                     break
-                is_connected_to_next[rand_dir][rand_x][rand_y] = True
+                self._set_connected(rand_pos, rand_dir, True)
+
+    def _gen_kruskal(self) -> None:
+        ''' Opens only the passages of a random spanning tree.
+
+        Like _gen_random_walls(), this leaves x_size * y_size - 1 passages,
+        which is the fewest that keep every cell reachable.
+        '''
+        edges = []
+        for x in range(self._x_size):
+            for y in range(self._y_size):
+                if x + 1 < self._x_size:
+                    edges.append(((x, y), (1, 0)))
+                if y + 1 < self._y_size:
+                    edges.append(((x, y), (0, 1)))
+        self._random.shuffle(edges)
+        # union-find over the cell indices
+        parents = list(range(self._x_size * self._y_size))
+
+        def find(cell):
+            while parents[cell] != cell:
+                parents[cell] = parents[parents[cell]]
+                cell = parents[cell]
+            return cell
+
+        num_passages = 0
+        for pos, direction in edges:
+            cell = pos[0] * self._y_size + pos[1]
+            next_cell = cell + direction[0] * self._y_size + direction[1]
+            root = find(cell)
+            next_root = find(next_cell)
+            if root != next_root:
+                parents[root] = next_root
+                self._set_connected(pos, direction, True)
+                num_passages += 1
+                if num_passages == len(parents) - 1:
+                    break
 
     @staticmethod
     def directions() -> List[Tuple[int, int]]:
@@ -44,25 +104,30 @@ class MazeMap:
 
     def is_connected(self, pos: Tuple[int, int],
                      direction: Tuple[int, int]) -> bool:
-        x = pos[0]
-        y = pos[1]
-        if direction == (1, 0):
-            if x + 1 == self._x_size:
-                return False
-            return self._is_connected_to_next_x[x][y]
-        if direction == (-1, 0):
-            if x == 0:
-                return False
-            return self._is_connected_to_next_x[x - 1][y]
-        if direction == (0, 1):
-            if y + 1 == self._y_size:
-                return False
-            return self._is_connected_to_next_y[x][y]
-        if direction == (0, -1):
-            if y == 0:
-                return False
-            return self._is_connected_to_next_y[x][y - 1]
-        assert False
+        return bool(self._cells[pos[0] * self._y_size + pos[1]]
+                    & DIRECTION_BITS[direction])
+
+    def connections(self, direction: Tuple[int, int]) -> bytes:
+        ''' Returns 1 for every cell connected in the direction, else 0'''
+        return self._cells.translate(_CONNECTION_TABLES[direction])
+
+    def distances(self, pos: Tuple[int, int]) -> List[int]:
+        ''' Returns the number of moves from pos to every cell, at index
+        x * y_size + y, -1 for the cells that cannot be reached'''
+        distances = [-1] * (self._x_size * self._y_size)
+        distances[pos[0] * self._y_size + pos[1]] = 0
+        queue = collections.deque([pos])
+        while queue:
+            x, y = queue.popleft()
+            distance = distances[x * self._y_size + y] + 1
+            for dir in self.directions():
+                if not self.is_connected((x, y), dir):
+                    continue
+                next_cell = (x + dir[0]) * self._y_size + y + dir[1]
+                if distances[next_cell] == -1:
+                    distances[next_cell] = distance
+                    queue.append((x + dir[0], y + dir[1]))
+        return distances
 
     def x_size(self) -> int:
         return self._x_size
@@ -70,22 +135,38 @@ class MazeMap:
     def y_size(self) -> int:
         return self._y_size
 
+    def _is_inside(self, pos: Tuple[int, int]) -> bool:
+        return 0 <= pos[0] < self._x_size and 0 <= pos[1] < self._y_size
+
+    def _set_connected(self, pos: Tuple[int, int], direction: Tuple[int, int],
+                       connected: bool) -> None:
+        next_pos = (pos[0] + direction[0], pos[1] + direction[1])
+        assert self._is_inside(pos) and self._is_inside(next_pos)
+        opposite = (-direction[0], -direction[1])
+        for cell_pos, cell_dir in [(pos, direction), (next_pos, opposite)]:
+            index = cell_pos[0] * self._y_size + cell_pos[1]
+            if connected:
+                self._cells[index] |= DIRECTION_BITS[cell_dir]
+            else:
+                self._cells[index] &= ~DIRECTION_BITS[cell_dir]
+
     def _is_connected(self) -> bool:
         visited = [[False] * self._y_size for i in range(self._x_size)]
-        self._visit(visited, 0, 0)
-        for x in range(self._x_size):
-            for y in range(self._y_size):
-                if not visited[x][y]:
-                    return False
-        return True
-
-    def _visit(self, visited, x, y) -> None:
-        if visited[x][y]:
-            return
-        visited[x][y] = True
-        for dir in self.directions():
-            if self.is_connected((x, y), dir):
-                self._visit(visited, x + dir[0], y + dir[1])
+        visited[0][0] = True
+        num_visited = 1
+        stack = [(0, 0)]
+        while stack:
+            x, y = stack.pop()
+            for dir in self.directions():
+                if not self.is_connected((x, y), dir):
+                    continue
+                next_x = x + dir[0]
+                next_y = y + dir[1]
+                if not visited[next_x][next_y]:
+                    visited[next_x][next_y] = True
+                    num_visited += 1
+                    stack.append((next_x, next_y))
+        return num_visited == self._x_size * self._y_size
 
 
 def main():
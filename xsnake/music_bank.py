@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import queue
+import threading
+
+import pygame
+
+SONG_VOLUME = 0.3
+ENDING_VOLUME = 1.0
+CROSSFADE_MS = 500
+# the decoded songs kept besides the ending, a song takes tens of MB
+MAX_SONGS = 2
+# posted when a track that was asked for is decoded
+MUSIC_READY = pygame.event.custom_type()
+
+
+class MusicBank:
+    ''' Decodes the tracks ahead in a background thread, and crossfades
+    between them on two reserved channels.
+
+    Nothing here waits for decoding: a track that is not ready yet starts
+    when update() is called after MUSIC_READY, while the previous one keeps
+    playing. The ending is decoded first and never dropped.
+    '''
+
+    def __init__(self, songs: list, ending: str) -> None:
+        assert songs
+        self._songs = songs
+        self._next_song = 0
+        self._ending = ending
+        # the decoded tracks by path, shared with the decoding thread
+        self._sounds = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._requested = set()
+        self._requests = queue.Queue()
+        pygame.mixer.set_reserved(2)
+        self._channels = [pygame.mixer.Channel(0), pygame.mixer.Channel(1)]
+        self._channel = 0
+        # the track to play as soon as it is decoded
+        self._wanted = None
+        self._is_closed = False
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+        self._request(ending)
+        self._request(songs[0])
+
+    def play_next(self) -> None:
+        ''' Switches to the next song, and decodes the one after it'''
+        song = self._songs[self._next_song]
+        self._next_song = (self._next_song + 1) % len(self._songs)
+        self._request(self._songs[self._next_song])
+        self._play(song)
+
+    def play_ending(self) -> None:
+        self._play(self._ending)
+
+    def stop(self) -> None:
+        self._wanted = None
+        for channel in self._channels:
+            channel.fadeout(CROSSFADE_MS)
+
+    def update(self) -> None:
+        ''' Starts the wanted track if it is decoded now'''
+        if self._wanted:
+            self._play(self._wanted)
+
+    def close(self) -> None:
+        ''' Waits for the track being decoded, before the mixer is quit'''
+        self._is_closed = True
+        self._requests.put(None)
+        self._thread.join()
+
+    def _play(self, path: str) -> None:
+        with self._lock:
+            sound = self._sounds.get(path)
+            if sound is not None:
+                self._sounds.move_to_end(path)
+        if sound is None:
+            self._wanted = path
+            self._request(path)
+            return
+        self._wanted = None
+        self._channels[self._channel].fadeout(CROSSFADE_MS)
+        self._channel = 1 - self._channel
+        self._channels[self._channel].play(
+            sound, loops=-1, fade_ms=CROSSFADE_MS)
+
+    def _request(self, path: str) -> None:
+        with self._lock:
+            if path in self._sounds or path in self._requested:
+                return
+            self._requested.add(path)
+        self._requests.put(path)
+
+    def _decode_loop(self) -> None:
+        while True:
+            path = self._requests.get()
+            if self._is_closed:
+                return
+            sound = pygame.mixer.Sound(path)
+            sound.set_volume(
+                ENDING_VOLUME if path == self._ending else SONG_VOLUME)
+            with self._lock:
+                self._requested.discard(path)
+                self._sounds[path] = sound
+                songs = [p for p in self._sounds if p != self._ending]
+                # the oldest song may still be fading out, which is fine
+                for song in songs[:-MAX_SONGS]:
+                    del self._sounds[song]
+            pygame.event.post(pygame.event.Event(MUSIC_READY))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Callable, Tuple
+import random
+
+# the random free cells tried before looking through all of them
+ALLOWED_TRIES = 16
+
+
+class Occupancy:
+    ''' How many times each cell is covered, and the cells that are free.
+
+    The free cells are kept in an array where a cell is removed by swapping it
+    with the last one, so picking a random free cell and updating a cell are
+    O(1). Cell (x, y) is at index x * y_size + y, like in MazeMap.
+    '''
+
+    def __init__(self,
+                 x_size: int,
+                 y_size: int,
+                 rng: random.Random = None) -> None:
+        ''' rng defaults to the random module'''
+        self._y_size = y_size
+        self._random = rng or random
+        self._counts = [0] * (x_size * y_size)
+        self._free_cells = list(range(x_size * y_size))
+        # the index of every cell in _free_cells, -1 for a covered cell
+        self._free_indices = list(range(x_size * y_size))
+
+    def count(self, pos: Tuple[int, int]) -> int:
+        return self._counts[pos[0] * self._y_size + pos[1]]
+
+    def num_free(self) -> int:
+        return len(self._free_cells)
+
+    def add(self, pos: Tuple[int, int]) -> None:
+        cell = pos[0] * self._y_size + pos[1]
+        self._counts[cell] += 1
+        if self._counts[cell] == 1:
+            index = self._free_indices[cell]
+            last_cell = self._free_cells[-1]
+            self._free_cells[index] = last_cell
+            self._free_indices[last_cell] = index
+            self._free_cells.pop()
+            self._free_indices[cell] = -1
+
+    def remove(self, pos: Tuple[int, int]) -> None:
+        cell = pos[0] * self._y_size + pos[1]
+        assert self._counts[cell] > 0
+        self._counts[cell] -= 1
+        if self._counts[cell] == 0:
+            self._free_indices[cell] = len(self._free_cells)
+            self._free_cells.append(cell)
+
+    def random_free_pos(self,
+                        is_allowed: Callable[[int], bool] = None
+                        ) -> Tuple[int, int]:
+        ''' Every free cell, or every free cell for which is_allowed(cell
+        index) is true if there is one, is equally likely'''
+        assert self._free_cells
+        if is_allowed is None:
+            return divmod(self._random.choice(self._free_cells), self._y_size)
+        for _ in range(ALLOWED_TRIES):
+            cell = self._random.choice(self._free_cells)
+            if is_allowed(cell):
+                return divmod(cell, self._y_size)
+        # few free cells are allowed, or none
+        allowed = [cell for cell in self._free_cells if is_allowed(cell)]
+        return divmod(self._random.choice(allowed or self._free_cells),
+                      self._y_size)
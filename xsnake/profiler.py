@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import time
+
+# walls is the background rendered once per level, the rest is per frame
+PHASES = [
+    'walls', 'move', 'background', 'hint', 'body', 'sprites', 'overlay', 'flip'
+]
+COUNTERS = ['is_connected', 'draw_calls']
+# the frames summarized on the screen
+SUMMARY_FRAMES = 300
+
+
+class Profiler:
+    ''' Times the phases of every frame and counts calls.
+
+    A phase is timed from the last start() or lap() to lap(phase). Whatever is
+    timed or counted until end_frame() belongs to the frame.
+    '''
+
+    def __init__(self) -> None:
+        # the frame time, the phase times and the counters of every frame
+        self._frames = []
+        self._last = time.perf_counter()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._counts = dict.fromkeys(COUNTERS, 0)
+
+    def start(self) -> None:
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self._times[phase] += now - self._last
+        self._last = now
+
+    def count(self, counter: str, n: int = 1) -> None:
+        self._counts[counter] += n
+
+    def count_calls(self, obj, method: str, counter: str) -> None:
+        ''' Counts the calls of the method of obj, and only of this object'''
+        original = getattr(obj, method)
+
+        def counted(*args, **kwargs):
+            self._counts[counter] += 1
+            return original(*args, **kwargs)
+
+        setattr(obj, method, counted)
+
+    def end_frame(self) -> None:
+        times = [self._times[phase] for phase in PHASES]
+        self._frames.append([sum(times)] + times +
+                            [self._counts[counter] for counter in COUNTERS])
+        self._reset()
+
+    def summary_lines(self) -> list:
+        ''' Returns the percentiles of the frame time, the mean time of every
+        phase and the mean counts of the last frames'''
+        frames = self._frames[-SUMMARY_FRAMES:]
+        if not frames:
+            return ['no frames yet']
+        frame_times = sorted(frame[0] for frame in frames)
+        lines = [
+            'frame ms p50 {:.2f} p90 {:.2f} p99 {:.2f} max {:.2f}'.format(
+                *(1000 * frame_times[len(frame_times) * p // 100]
+                  for p in (50, 90, 99)), 1000 * frame_times[-1])
+        ]
+        for i, phase in enumerate(PHASES):
+            lines.append('{} ms {:.3f}'.format(
+                phase, 1000 * sum(frame[1 + i] for frame in frames) /
+                len(frames)))
+        for i, counter in enumerate(COUNTERS):
+            lines.append('{} {:.1f}'.format(
+                counter,
+                sum(frame[1 + len(PHASES) + i] for frame in frames) /
+                len(frames)))
+        return lines
+
+    def write_csv(self, path: str) -> None:
+        ''' One row per frame, times in seconds'''
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + PHASES + COUNTERS)
+            writer.writerows(self._frames)
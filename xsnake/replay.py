@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import struct
+
+import maze_map
+
+MAGIC = b'XSNAKE'
+VERSION = 2
+# magic, version, flags, maze generator index, first map size, session seed,
+# max food distance, followed by one byte per event
+HEADER = struct.Struct('<6sBBBHQH')
+FLAG_MAZE = 0x01
+# an event is the index of a direction in MazeMap.directions(), or NEXT_LEVEL
+# when SPACE starts the next level
+NEXT_LEVEL = 0xff
+
+ReplayHeader = collections.namedtuple(
+    'ReplayHeader',
+    ['map_size', 'maze', 'maze_generator', 'seed', 'max_food_distance'])
+
+
+class ReplayWriter:
+    ''' Records the moves of a session, so that it can be played again.
+
+    Every level gets the next seed of random.Random(seed), see main.py.
+    '''
+
+    def __init__(self, path: str, header: ReplayHeader) -> None:
+        self._file = open(path, 'wb')
+        self._file.write(
+            HEADER.pack(MAGIC, VERSION, FLAG_MAZE if header.maze else 0,
+                        maze_map.MazeMap.GENERATORS.index(
+                            header.maze_generator), header.map_size,
+                        header.seed, header.max_food_distance))
+        self._directions = maze_map.MazeMap.directions()
+
+    def move(self, direction) -> None:
+        self._write(self._directions.index(direction))
+
+    def next_level(self) -> None:
+        self._write(NEXT_LEVEL)
+
+    def _write(self, event: int) -> None:
+        self._file.write(bytes([event]))
+        # keep the replay complete even if the game is killed
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def load_replay(path: str) -> (ReplayHeader, list):
+    ''' Returns the header and the events, directions or NEXT_LEVEL'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    (magic, version, flags, generator_idx, map_size, seed,
+     max_food_distance) = HEADER.unpack_from(data)
+    assert magic == MAGIC, path + ' is not a replay'
+    assert version == VERSION
+    header = ReplayHeader(map_size, bool(flags & FLAG_MAZE),
+                          maze_map.MazeMap.GENERATORS[generator_idx], seed,
+                          max_food_distance)
+    directions = maze_map.MazeMap.directions()
+    events = [
+        NEXT_LEVEL if event == NEXT_LEVEL else directions[event]
+        for event in data[HEADER.size:]
+    ]
+    return header, events
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Tuple
+import argparse
+import collections
+import random
+import time
+
+import maze_map
+import occupancy
+import replay
+
+# the results of SnakeCore.move()
+BLOCKED = 0
+MOVED = 1
+ATE = 2
+ENDED = 3
+
+
+def gen_maze_map(map_size: int, maze: bool, maze_generator: str,
+                 seed: int) -> maze_map.MazeMap:
+    ''' Returns the same maze for the same arguments'''
+    return maze_map.MazeMap(map_size, map_size, maze, maze_generator,
+                            random.Random('maze:{}'.format(seed)))
+
+
+class SnakeCore:
+    ''' The rules of a level, without display or audio.
+
+    Everything random comes from the seed, so the same seed and moves always
+    give the same game.
+    '''
+
+    def __init__(self,
+                 map_size: int,
+                 maze: bool,
+                 maze_generator: str,
+                 seed: int,
+                 level_map: maze_map.MazeMap = None,
+                 max_food_distance: int = 0) -> None:
+        ''' level_map is gen_maze_map() of the same arguments, if it was
+        generated before.
+
+        With max_food_distance, the food is placed at most that many moves away
+        from the head, if a free cell is.
+        '''
+        self._maze_map = level_map or gen_maze_map(map_size, maze,
+                                                   maze_generator, seed)
+        self._occupancy = occupancy.Occupancy(
+            map_size, map_size, random.Random('food:{}'.format(seed)))
+        # the head is on the left
+        self._snake_pos = collections.deque([(map_size // 2, map_size // 2)] *
+                                            2)
+        for pos in self._snake_pos:
+            self._occupancy.add(pos)
+        self._max_food_distance = max_food_distance
+        self._food_pos = None
+        self._food_distances = None
+        self._food_pos = self._gen_food_pos()
+        self._is_ended = False
+        self._ending_length = min(map_size * 2, map_size * map_size // 2)
+
+    def move(self, direction: Tuple[int, int]) -> int:
+        ''' Returns BLOCKED, MOVED, ATE or ENDED'''
+        assert direction in self._maze_map.directions()
+        if self._is_ended or not self._maze_map.is_connected(
+                self._snake_pos[0], direction):
+            return BLOCKED
+        new_head_pos = (self._snake_pos[0][0] + direction[0],
+                        self._snake_pos[0][1] + direction[1])
+        if new_head_pos != self._food_pos:
+            self._occupancy.remove(self._snake_pos.pop())
+            self._snake_pos.appendleft(new_head_pos)
+            self._occupancy.add(new_head_pos)
+            return MOVED
+        self._snake_pos.appendleft(new_head_pos)
+        self._occupancy.add(new_head_pos)
+        if len(self._snake_pos) >= self._ending_length:
+            self._is_ended = True
+            return ENDED
+        self._food_pos = self._gen_food_pos()
+        return ATE
+
+    def _gen_food_pos(self) -> Tuple[int, int]:
+        if not self._max_food_distance:
+            self._food_distances = None
+            return self._occupancy.random_free_pos()
+        if self._food_pos == self._snake_pos[0]:
+            # the distances from the food that was just eaten
+            head_distances = self._get_food_distances()
+        else:
+            head_distances = self._maze_map.distances(self._snake_pos[0])
+        self._food_distances = None
+        return self._occupancy.random_free_pos(
+            lambda cell: 0 <= head_distances[cell] <= self._max_food_distance)
+
+    def _get_food_distances(self) -> list:
+        ''' The distances from the food, computed once per food'''
+        if self._food_distances is None:
+            self._food_distances = self._maze_map.distances(self._food_pos)
+        return self._food_distances
+
+    def path_to_food(self) -> list:
+        ''' Returns the cells of a shortest path from the head to the food,
+        without both'''
+        distances = self._get_food_distances()
+        y_size = self._maze_map.y_size()
+        pos = self._snake_pos[0]
+        distance = distances[pos[0] * y_size + pos[1]]
+        path = []
+        while distance > 1:
+            for dir in self._maze_map.directions():
+                next_pos = (pos[0] + dir[0], pos[1] + dir[1])
+                if (self._maze_map.is_connected(pos, dir) and
+                        distances[next_pos[0] * y_size + next_pos[1]]
+                        == distance - 1):
+                    break
+            pos = next_pos
+            distance -= 1
+            path.append(pos)
+        return path
+
+    def maze_map(self) -> maze_map.MazeMap:
+        return self._maze_map
+
+    def snake_pos(self) -> collections.deque:
+        ''' The cells of the snake from the head to the tail'''
+        return self._snake_pos
+
+    def count(self, pos: Tuple[int, int]) -> int:
+        ''' Returns how many times the snake covers the cell'''
+        return self._occupancy.count(pos)
+
+    def food_pos(self) -> Tuple[int, int]:
+        return self._food_pos
+
+    def ending_length(self) -> int:
+        return self._ending_length
+
+    def is_ended(self) -> bool:
+        return self._is_ended
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Play without a display, a replay or random moves')
+    parser.add_argument('--replay', help='replay file to play')
+    parser.add_argument('--map_size', type=int, default=20)
+    parser.add_argument('--maze', action='store_true')
+    parser.add_argument(
+        '--maze_generator',
+        choices=maze_map.MazeMap.GENERATORS,
+        default='kruskal')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max_food_distance', type=int, default=0)
+    parser.add_argument('--steps', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.replay:
+        header, events = replay.load_replay(args.replay)
+        map_size = header.map_size
+        level_seeds = random.Random(header.seed)
+        core = SnakeCore(
+            map_size,
+            header.maze,
+            header.maze_generator,
+            level_seeds.getrandbits(32),
+            max_food_distance=header.max_food_distance)
+        for event in events:
+            if event == replay.NEXT_LEVEL:
+                map_size += 1
+                core = SnakeCore(
+                    map_size,
+                    header.maze,
+                    header.maze_generator,
+                    level_seeds.getrandbits(32),
+                    max_food_distance=header.max_food_distance)
+            else:
+                core.move(event)
+        print('map_size: {} length: {} head: {} food: {} ended: {}'.format(
+            map_size, len(core.snake_pos()), core.snake_pos()[0],
+            core.food_pos(), core.is_ended()))
+        return
+
+    # random moves, starting a new level with the next seed at the end
+    moves = random.Random(args.seed)
+    directions = maze_map.MazeMap.directions()
+    seed = args.seed
+    core = SnakeCore(
+        args.map_size,
+        args.maze,
+        args.maze_generator,
+        seed,
+        max_food_distance=args.max_food_distance)
+    num_levels = 1
+    start = time.monotonic()
+    for _ in range(args.steps):
+        if core.move(moves.choice(directions)) == ENDED:
+            seed += 1
+            core = SnakeCore(
+                args.map_size,
+                args.maze,
+                args.maze_generator,
+                seed,
+                max_food_distance=args.max_food_distance)
+            num_levels += 1
+    elapsed = time.monotonic() - start
+    print('steps: {} levels: {} steps/s: {:.0f}'.format(
+        args.steps, num_levels, args.steps / elapsed))
+
+
+if __name__ == '__main__':
+    main()